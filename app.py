@@ -1,51 +1,108 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse, FileResponse
-from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.gzip import GZipMiddleware
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, ConfigDict, Field
 import pandas as pd
-import requests, json, os
+import httpx, os, io, asyncio, anyio, time, hashlib, orjson, csv, logging
 from typing import List, Dict
+from operator import attrgetter
 
 SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
 SERVE_PORT = os.getenv("SERVE_PORT", "5000")
 PRED_URL   = f"http://{SERVE_HOST}:{SERVE_PORT}/invocations"
 DATA_CSV   = "./data/winequalityN.csv"
 REQUESTS_LOG = "./artifacts/requests.csv"
+logger = logging.getLogger(__name__)
+# behind nginx: internal location that maps to ./artifacts, so nginx sendfile()s downloads
+X_ACCEL_BASE = os.getenv("X_ACCEL_BASE")
 
-app = FastAPI(title="Wine Quality – Demo Dashboard")
+# async keep-alive client for the MLflow server, shared by the batch worker and /health;
+# created in lifespan so it binds to the serving event loop
+HTTP_CLIENT: httpx.AsyncClient = None
 
-FEATURES = ["type","fixed acidity","volatile acidity","citric acid","residual sugar",
-            "chlorides","free sulfur dioxide","total sulfur dioxide","density","pH",
-            "sulphates","alcohol"]  # target 'quality' excluded
+# blocking handler work (CSV parsing) runs in the threadpool; ~2x cores by default
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 2 * (os.cpu_count() or 1)))
+
+# micro-batching: concurrent /predict calls are coalesced into one /invocations call of up to
+# ~MAX_BATCH rows (a single request is never split), waiting at most MAX_WAIT_MS for company
+MAX_BATCH   = int(os.getenv("MAX_BATCH", "512"))
+MAX_WAIT_MS = float(os.getenv("MAX_WAIT_MS", "10"))
+pending: "asyncio.Queue[tuple[List[tuple], asyncio.Future]]" = None
+# at most PREDICT_PARALLELISM batches are in flight against the MLflow server
+PREDICT_PARALLELISM = int(os.getenv("PREDICT_PARALLELISM", "4"))
+
+# request log: one append handle for the process lifetime, opened on the first logged batch
+# and flushed by a background task
+LOG_FLUSH_SECS = 0.25
+LOG_FH   = None
+LOG_WRITER = None
+LOG_LOCK = asyncio.Lock()
+
+HEALTH_TTL_SECS = 2
+_HEALTH_CACHE = {"ts": 0.0, "val": None}
+
+# /data-stats is memoized on the dataset's (mtime, size): a stat() per call instead of a CSV parse.
+# Holds (key, encoded body, etag); the body is encoded once so hits skip serialization entirely.
+DATA_STATS_CACHE = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global pending, HTTP_CLIENT
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    pending = asyncio.Queue()
+    limits = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+    # with an explicit transport httpx takes the pool limits from the transport only
+    HTTP_CLIENT = httpx.AsyncClient(timeout=30,
+                                    transport=httpx.AsyncHTTPTransport(retries=2, limits=limits))
+    await run_in_threadpool(_data_stats)  # warm the cache
+    tasks = [asyncio.create_task(batch_worker()), asyncio.create_task(periodic_flush())]
+    yield
+    for t in tasks:
+        t.cancel()
+    await HTTP_CLIENT.aclose()
+    async with LOG_LOCK:
+        if LOG_FH is not None:
+            LOG_FH.flush()
+            LOG_FH.close()
+
+app = FastAPI(title="Wine Quality – Demo Dashboard", lifespan=lifespan)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
 
 class Record(BaseModel):
+    # aliases are the training column names; the snake_case field names are accepted as well
+    model_config = ConfigDict(populate_by_name=True)
     type: str
-    fixed_acidity: float
-    volatile_acidity: float
-    citric_acid: float
-    residual_sugar: float
+    fixed_acidity: float = Field(alias="fixed acidity")
+    volatile_acidity: float = Field(alias="volatile acidity")
+    citric_acid: float = Field(alias="citric acid")
+    residual_sugar: float = Field(alias="residual sugar")
     chlorides: float
-    free_sulfur_dioxide: float
-    total_sulfur_dioxide: float
+    free_sulfur_dioxide: float = Field(alias="free sulfur dioxide")
+    total_sulfur_dioxide: float = Field(alias="total sulfur dioxide")
     density: float
     pH: float
     sulphates: float
     alcohol: float
 
-def _to_dataframe(records: List[Record]) -> pd.DataFrame:
-    df = pd.DataFrame([r.model_dump() for r in records])
-    # match training column names (spaces & casing)
-    df.columns = ["type","fixed acidity","volatile acidity","citric acid","residual sugar",
-                  "chlorides","free sulfur dioxide","total sulfur dioxide","density","pH",
-                  "sulphates","alcohol"]
-    return df[FEATURES]
-
-def _post_invocations(df: pd.DataFrame) -> List[int]:
-    payload = {"dataframe_split": {"columns": list(df.columns), "data": df.values.tolist()}}
-    r = requests.post(PRED_URL, headers={"Content-Type": "application/json"},
-                      data=json.dumps(payload), timeout=30)
+# training column names in Record field order; target 'quality' excluded
+FEATURES = [f.alias or name for name, f in Record.model_fields.items()]
+
+# resolve the field accessor once instead of building a model_dump() dict per record
+_to_row = attrgetter(*Record.model_fields)
+
+async def _post_invocations(rows: List[tuple]) -> List[int]:
+    # CSV body (same format perturb_test.py sends): C-level csv writer, smaller than dataframe_split JSON
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(FEATURES)
+    w.writerows(rows)
+    r = await HTTP_CLIENT.post(PRED_URL, content=buf.getvalue().encode("utf-8"),
+                               headers={"Content-Type": "text/csv"})
     if r.status_code != 200:
         raise HTTPException(status_code=502, detail=f"MLflow serve error: {r.text[:200]}")
-    obj = r.json()
+    obj = orjson.loads(r.content)
     # MLflow/H2O pyfunc returns {"predictions":[{"predict":int,...},...]} or {"predictions":[int,...]}
     if isinstance(obj, dict) and "predictions" in obj:
         preds = obj["predictions"]
@@ -54,52 +111,193 @@ def _post_invocations(df: pd.DataFrame) -> List[int]:
         return [int(v) for v in preds]
     raise HTTPException(status_code=500, detail="Unexpected prediction schema")
 
-def _log_rows(df: pd.DataFrame, preds: List[int]):
+def _open_log():
+    # created lazily so /download-logs keeps answering 404 until something was predicted
+    global LOG_FH, LOG_WRITER
     os.makedirs(os.path.dirname(REQUESTS_LOG), exist_ok=True)
-    df2 = df.copy()
-    df2["prediction"] = preds
-    mode = "a" if os.path.exists(REQUESTS_LOG) else "w"
-    header = not os.path.exists(REQUESTS_LOG)
-    df2.to_csv(REQUESTS_LOG, index=False, mode=mode, header=header)
+    LOG_FH = open(REQUESTS_LOG, "a", newline="", buffering=1 << 16)
+    LOG_WRITER = csv.writer(LOG_FH, lineterminator="\n")
+    if LOG_FH.tell() == 0:
+        LOG_WRITER.writerow(FEATURES + ["prediction"])
+        return
+    # a killed process can leave a partially flushed last row; end it so new rows start on their own line
+    with open(REQUESTS_LOG, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            LOG_FH.write("\n")
+
+def _log_rows(rows: List[tuple], preds: List[int]):
+    # caller holds LOG_LOCK; rows are value tuples in FEATURES order
+    if LOG_FH is None:
+        _open_log()
+    LOG_WRITER.writerows((*row, pred) for row, pred in zip(rows, preds))
+
+async def periodic_flush():
+    while True:
+        await asyncio.sleep(LOG_FLUSH_SECS)
+        try:
+            async with LOG_LOCK:
+                if LOG_FH is not None:
+                    LOG_FH.flush()
+        except OSError:
+            logger.exception("Failed to flush %s", REQUESTS_LOG)
+
+async def _score_batch(rows: List[tuple]) -> List[int]:
+    preds = await _post_invocations(rows)
+    if len(preds) != len(rows):
+        raise HTTPException(status_code=500, detail="Prediction count does not match batch size")
+    return preds
+
+async def _score_items(items: list):
+    # answers every future in items and returns the (rows, preds) that scored; a failed
+    # batch is split in half and retried, so only the request that caused the error gets it
+    rows = [row for req_rows, _ in items for row in req_rows]
+    try:
+        preds = await _score_batch(rows)
+    except Exception as e:
+        if len(items) == 1:
+            fut = items[0][1]
+            if not fut.done():
+                fut.set_exception(e)
+            return [], []
+        mid = len(items) // 2
+        (rows_a, preds_a), (rows_b, preds_b) = await asyncio.gather(
+            _score_items(items[:mid]), _score_items(items[mid:]))
+        return rows_a + rows_b, preds_a + preds_b
+    start = 0
+    for req_rows, fut in items:
+        end = start + len(req_rows)
+        if not fut.done():
+            fut.set_result(preds[start:end])
+        start = end
+    return rows, preds
+
+async def _run_batch(items: list, slots: asyncio.Semaphore):
+    try:
+        rows, preds = await _score_items(items)
+    finally:
+        slots.release()
+    # callers are answered before logging: a failed log write must not leave their futures pending
+    if not rows:
+        return
+    try:
+        async with LOG_LOCK:
+            _log_rows(rows, preds)
+    except Exception:
+        logger.exception("Failed to write %d rows to %s", len(rows), REQUESTS_LOG)
+
+async def batch_worker():
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(PREDICT_PARALLELISM)
+    running = set()
+    while True:
+        # wait for a free slot first, so rows keep accumulating while all slots are busy
+        await slots.acquire()
+        items = [await pending.get()]
+        n_rows = len(items[0][0])
+        deadline = loop.time() + MAX_WAIT_MS / 1000
+        while n_rows < MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(pending.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            n_rows += len(item[0])
+        task = asyncio.create_task(_run_batch(items, slots))
+        running.add(task)
+        task.add_done_callback(running.discard)
 
 @app.get("/health")
-def health():
+async def health():
+    # the dashboard polls this on every page load; reuse the last ping for a short TTL
+    now = time.monotonic()
+    if _HEALTH_CACHE["val"] is not None and now - _HEALTH_CACHE["ts"] < HEALTH_TTL_SECS:
+        return _HEALTH_CACHE["val"]
     try:
         # some builds have /ping, otherwise try a tiny bogus request to /invocations
-        requests.get(f"http://{SERVE_HOST}:{SERVE_PORT}/ping", timeout=2)
-        return {"status": "up", "mlflow": f"{SERVE_HOST}:{SERVE_PORT}"}
+        await HTTP_CLIENT.get(f"http://{SERVE_HOST}:{SERVE_PORT}/ping", timeout=2)
+        val = {"status": "up", "mlflow": f"{SERVE_HOST}:{SERVE_PORT}"}
     except Exception:
-        return {"status": "unknown", "mlflow": f"{SERVE_HOST}:{SERVE_PORT}"}
+        val = {"status": "unknown", "mlflow": f"{SERVE_HOST}:{SERVE_PORT}"}
+    _HEALTH_CACHE.update(ts=now, val=val)
+    return val
 
-@app.get("/data-stats")
-def data_stats():
-    if not os.path.exists(DATA_CSV):
-        raise HTTPException(404, "Dataset not found at ./data/winequalityN.csv")
-    df = pd.read_csv(DATA_CSV)
+def _compute_data_stats():
+    cols = list(pd.read_csv(DATA_CSV, nrows=0).columns)
+    # only the two counted columns are parsed; pyarrow is the multithreaded C++ parser
+    df = pd.read_csv(DATA_CSV, engine="pyarrow", usecols=["type", "quality"],
+                     dtype={"type": "category", "quality": "int8"})
     return {
         "rows": len(df),
-        "cols": list(df.columns),
+        "cols": cols,
         "target": "quality",
         "type_counts": df["type"].value_counts().to_dict(),
         "quality_counts": df["quality"].value_counts().sort_index().to_dict(),
     }
 
+def _data_stats():
+    global DATA_STATS_CACHE
+    try:
+        st = os.stat(DATA_CSV)
+    except FileNotFoundError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    cached = DATA_STATS_CACHE
+    if cached is None or cached[0] != key:
+        body = orjson.dumps(_compute_data_stats(), option=orjson.OPT_NON_STR_KEYS)
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        cached = DATA_STATS_CACHE = (key, body, etag)
+    return cached
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+@app.get("/data-stats")
+def data_stats(request: Request):
+    cached = _data_stats()
+    if cached is None:
+        raise HTTPException(404, "Dataset not found at ./data/winequalityN.csv")
+    _, body, etag = cached
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
 @app.post("/predict")
-def predict(records: List[Record]):
-    df = _to_dataframe(records)
-    preds = _post_invocations(df)
-    _log_rows(df, preds)
-    return {"predictions": preds}
+async def predict(records: List[Record]):
+    if not records:
+        return {"predictions": []}
+    fut = asyncio.get_running_loop().create_future()
+    await pending.put(([_to_row(r) for r in records], fut))
+    return {"predictions": await fut}
 
 @app.get("/download-logs")
-def download_logs():
-    if os.path.exists(REQUESTS_LOG):
-        return FileResponse(REQUESTS_LOG, filename="requests.csv")
-    raise HTTPException(404, "No logs yet")
+async def download_logs(request: Request):
+    if LOG_FH is not None:
+        async with LOG_LOCK:
+            LOG_FH.flush()
+    if not os.path.exists(REQUESTS_LOG):
+        raise HTTPException(404, "No logs yet")
+    st = os.stat(REQUESTS_LOG)
+    etag = f'W/"{st.st_mtime_ns:x}-{st.st_size:x}"'  # weak: derived from mtime + size
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    if X_ACCEL_BASE:
+        name = os.path.basename(REQUESTS_LOG)
+        return Response(media_type="text/csv", headers={
+            "X-Accel-Redirect": f"{X_ACCEL_BASE.rstrip('/')}/{name}",
+            "Content-Disposition": f'attachment; filename="{name}"',
+            "ETag": etag})
+    return FileResponse(REQUESTS_LOG, filename="requests.csv", media_type="text/csv",
+                        stat_result=st, headers={"ETag": etag})
 
-@app.get("/", response_class=HTMLResponse)
-def home():
-    return """<html><body>
+INDEX_HTML = """<html><body>
     <h2>Wine Demo</h2>
     <p>POST JSON to <code>/predict</code> or check <code>/health</code> and <code>/data-stats</code>.</p>
     <p>Example payload:</p>
@@ -108,3 +306,16 @@ def home():
    "chlorides":0.045,"free_sulfur_dioxide":45,"total_sulfur_dioxide":170,"density":1.001,"pH":3.0,
    "sulphates":0.45,"alcohol":8.8}
 ]</pre></body></html>"""
+INDEX_BYTES = INDEX_HTML.encode("utf-8")  # static page: encode once, let clients cache it
+
+@app.get("/", response_class=HTMLResponse)
+def home():
+    return HTMLResponse(content=INDEX_BYTES, headers={"Cache-Control": "public, max-age=3600"})
+
+if __name__ == "__main__":
+    import uvicorn
+    # Each worker keeps its own log buffer, so WEB_CONCURRENCY > 1 can interleave partial rows
+    # in requests.csv; raise it only with an external log sink.
+    # Scoring threads live in the MLflow server, so size its thread budget separately.
+    uvicorn.run("app:app", host=os.getenv("APP_HOST", "0.0.0.0"), port=int(os.getenv("APP_PORT", "8000")),
+                workers=int(os.getenv("WEB_CONCURRENCY", "1")), loop="uvloop", http="httptools")
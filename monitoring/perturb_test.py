@@ -1,12 +1,13 @@
 import os
+import io
 import json
+import orjson
 import pandas as pd
-import numpy as np
-import requests
-from sklearn.metrics import accuracy_score, f1_score
+from concurrent.futures import ThreadPoolExecutor
 from evidently.report import Report
-from evidently.metric_preset import DataDriftPreset, DataQualityPreset, TargetDriftPreset, ClassificationPreset
 from evidently import ColumnMapping
+from monitoring.monitor import DTYPES, PRESETS, REPORT_MODE
+from src.utils import classification_metrics, make_session
 
 # Paths & constants
 DATA_PATH = "./artifacts/test.csv"
@@ -14,19 +15,31 @@ OUTPUT_DIR = "./artifacts"
 URL = f"http://{os.getenv('SERVE_HOST','127.0.0.1')}:{os.getenv('SERVE_PORT','5000')}/invocations"
 REPORT_NAME = "drift_after"
 
+# Simulated drift: (column, additive shift, label recorded in the results JSON)
+PERTURBATIONS = [
+    ('alcohol', -1.2, "alcohol -1.2"),
+    ('volatile acidity', 0.1, "volatile_acidity +0.1"),
+]
+
+# keep-alive connection pool: the baseline and perturbed calls reuse one connection
+SESSION = make_session()
+
 # ---- Helpers ----
 def post_invocations_csv(url, X):
     """
     Send dataframe to MLflow model server using CSV format.
     This matches what worked in batch_infer.py.
     """
-    csv_bytes = X.to_csv(index=False).encode("utf-8")
+    # write UTF-8 straight into a bytes buffer: no intermediate str + encode copy
+    buf = io.BytesIO()
+    X.to_csv(buf, index=False, lineterminator="\n")
+    csv_bytes = buf.getvalue()
     headers = {"Content-Type": "text/csv"}
-    r = requests.post(url, headers=headers, data=csv_bytes)
+    r = SESSION.post(url, headers=headers, data=csv_bytes, timeout=30)
     print("DEBUG status", r.status_code, "body", r.text[:200])
     r.raise_for_status()
 
-    obj = r.json()
+    obj = orjson.loads(r.content)
     # H2O pyfunc returns {"predictions": [{"predict": <int>, ...}, ...]}
     if isinstance(obj, dict) and "predictions" in obj:
         preds = [row["predict"] for row in obj["predictions"]]
@@ -34,16 +47,17 @@ def post_invocations_csv(url, X):
         preds = obj
     return pd.Series(preds)
 
-def mapping(df):
+def mapping(df, numerical=None):
     """
     Build Evidently ColumnMapping for reports.
+    If `numerical` is given, only those columns are mapped (no categorical features).
     """
-    num_cols = [
+    num_cols = numerical if numerical is not None else [
         'fixed acidity','volatile acidity','citric acid','residual sugar','chlorides',
         'free sulfur dioxide','total sulfur dioxide','density','pH','sulphates','alcohol'
     ]
     num_cols = [c for c in num_cols if c in df.columns]
-    cat_cols = [c for c in ['type'] if c in df.columns]
+    cat_cols = [c for c in ['type'] if c in df.columns] if numerical is None else []
     return ColumnMapping(
         target='quality',
         prediction='prediction',
@@ -56,35 +70,27 @@ def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     # Load data
-    orig = pd.read_csv(DATA_PATH).dropna()
+    orig = pd.read_csv(DATA_PATH, dtype=DTYPES).dropna()
     y_true = orig['quality'].astype(int)
     X = orig.drop(columns=['quality'])
 
-    # Baseline predictions
-    yhat_base = post_invocations_csv(URL, X).astype(int)
-
-    # Perturb features
-    Xp = X.copy()
-    if 'alcohol' in Xp.columns:
-        Xp['alcohol'] = Xp['alcohol'] - 1.2
-    if 'volatile acidity' in Xp.columns:
-        Xp['volatile acidity'] = Xp['volatile acidity'] + 0.1
+    # Perturb features: shift the raw arrays in one vectorized op per column, no intermediate Series
+    applied = [(col, delta, label) for col, delta, label in PERTURBATIONS if col in X.columns]
+    Xp = X.assign(**{col: X[col].to_numpy() + delta for col, delta, _ in applied})
 
-    # Perturbed predictions
-    yhat_curr = post_invocations_csv(URL, Xp).astype(int)
+    # Baseline and perturbed predictions are independent: score both concurrently
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        fut_base = ex.submit(post_invocations_csv, URL, X)
+        fut_curr = ex.submit(post_invocations_csv, URL, Xp)
+        yhat_base = fut_base.result().astype(int)
+        yhat_curr = fut_curr.result().astype(int)
 
     # Compute metrics
-    base_acc = accuracy_score(y_true, yhat_base)
-    base_f1 = f1_score(y_true, yhat_base, average='weighted')
-    curr_acc = accuracy_score(y_true, yhat_curr)
-    curr_f1 = f1_score(y_true, yhat_curr, average='weighted')
+    base_acc, base_f1 = classification_metrics(y_true, yhat_base)
+    curr_acc, curr_f1 = classification_metrics(y_true, yhat_curr)
 
     # Save metrics JSON
-    changed = []
-    if 'alcohol' in X.columns:
-        changed.append("alcohol -1.2")
-    if 'volatile acidity' in X.columns:
-        changed.append("volatile_acidity +0.1")
+    changed = [label for _, _, label in applied]
 
     results = {
         "baseline_accuracy": float(base_acc),
@@ -105,24 +111,24 @@ def main():
     print(f"Perturbed:  Accuracy={curr_acc:.4f}, F1_weighted={curr_f1:.4f}")
 
     # Generate Evidently drift report
-    report = Report(metrics=[
-        DataDriftPreset(),
-        DataQualityPreset(),
-        TargetDriftPreset(),
-        ClassificationPreset()
-    ])
-    df_base = X.copy()
+    report = Report(metrics=[preset() for preset in PRESETS[REPORT_MODE]])
+    # fast mode only checks drift on the perturbed columns; full mode maps every feature
+    if REPORT_MODE == "fast":
+        column_mapping = mapping(orig, numerical=[col for col, _, _ in applied])
+    else:
+        column_mapping = mapping(orig)
+    del orig
+    # X and Xp are not used after scoring, so extend them in place instead of copying
+    df_base, df_curr = X, Xp
     df_base['quality'] = y_true
     df_base['prediction'] = yhat_base
-
-    df_curr = Xp.copy()
     df_curr['quality'] = y_true
     df_curr['prediction'] = yhat_curr
 
     report.run(
         reference_data=df_base,
         current_data=df_curr,
-        column_mapping=mapping(orig)
+        column_mapping=column_mapping
     )
 
     report_path = os.path.join(OUTPUT_DIR, f"{REPORT_NAME}.html")
@@ -1,16 +1,19 @@
-import os, json, argparse, requests, pandas as pd
-from sklearn.metrics import accuracy_score, f1_score
+import os, json, argparse, orjson, pandas as pd
 from dotenv import load_dotenv
+from src.utils import classification_metrics, make_session
 load_dotenv()
 
+# keep-alive connection pool, reused across calls to the MLflow server
+SESSION = make_session()
+
 def post_invocations(url, X):
     payload = {"dataframe_split": {"columns": list(X.columns), "data": X.values.tolist()}}
-    headers = {"Content-Type": "application/json"}
-    r = requests.post(url, headers=headers, data=json.dumps(payload))
+    r = SESSION.post(url, headers={"Content-Type": "application/json"}, data=orjson.dumps(payload),
+                     timeout=30)
     print("DEBUG status", r.status_code, "body", r.text[:200])
     r.raise_for_status()
 
-    obj = r.json()
+    obj = orjson.loads(r.content)
     # MLflow H2O pyfunc returns {"predictions": [ { "predict": <int>, "p3":..., ... }, ... ]}
     if isinstance(obj, dict) and "predictions" in obj:
         preds = [row["predict"] for row in obj["predictions"]]
@@ -20,6 +23,28 @@ def post_invocations(url, X):
     return pd.Series(preds)
 
 
+def run(input="artifacts/test.csv", url=None, out_preds="artifacts/preds.json",
+        out_metrics="artifacts/metrics.json", target=None):
+    """Score `input` against the serving endpoint and write preds/metrics; importable from the UI."""
+    url = url or f"http://{os.getenv('SERVE_HOST','127.0.0.1')}:{os.getenv('SERVE_PORT','5000')}/invocations"
+    target = target or os.getenv("TARGET", "quality")
+
+    df = pd.read_csv(input)
+    y_true = df[target].astype(int)
+    X = df.drop(columns=[target])  # IMPORTANT: do not send the target
+
+    yhat = post_invocations(url, X).astype(int)
+    acc, f1 = classification_metrics(y_true, yhat)
+
+    os.makedirs("artifacts", exist_ok=True)
+    with open(out_preds, "w") as f: json.dump({"pred": yhat.tolist()}, f)
+    with open(out_metrics, "w") as f: json.dump({"accuracy":acc, "f1_weighted":f1}, f, indent=2)
+
+    print(f"Accuracy={acc:.4f}  F1_weighted={f1:.4f}")
+    print(f"Saved → {out_preds}, {out_metrics}")
+    return {"accuracy": acc, "f1_weighted": f1}
+
+
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--input", default="artifacts/test.csv")
@@ -28,21 +53,7 @@ def main():
     p.add_argument("--out_metrics", default="artifacts/metrics.json")
     p.add_argument("--target", default=os.getenv("TARGET","quality"))
     args = p.parse_args()
-
-    df = pd.read_csv(args.input)
-    y_true = df[args.target].astype(int)
-    X = df.drop(columns=[args.target])  # IMPORTANT: do not send the target
-
-    yhat = post_invocations(args.url, X).astype(int)
-    acc = accuracy_score(y_true, yhat)
-    f1  = f1_score(y_true, yhat, average="weighted")
-
-    os.makedirs("artifacts", exist_ok=True)
-    with open(args.out_preds, "w") as f: json.dump({"pred": yhat.tolist()}, f)
-    with open(args.out_metrics, "w") as f: json.dump({"accuracy":acc, "f1_weighted":f1}, f, indent=2)
-
-    print(f"Accuracy={acc:.4f}  F1_weighted={f1:.4f}")
-    print("Saved → artifacts/preds.json, artifacts/metrics.json")
+    run(**vars(args))
 
 if __name__ == "__main__":
     main()
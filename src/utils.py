@@ -0,0 +1,25 @@
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def make_session():
+    """Keep-alive requests session for the MLflow server, with a small retry budget."""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=50,
+                                         max_retries=Retry(total=2, backoff_factor=0.1)))
+    return session
+
+def classification_metrics(y_true, y_pred):
+    """Accuracy and support-weighted F1 from one bincount confusion matrix (same values as sklearn)."""
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    if len(y_true) != len(y_pred):
+        raise ValueError(f"Inconsistent numbers of samples: {len(y_true)} labels, {len(y_pred)} predictions")
+    labels, idx = np.unique(np.concatenate([y_true, y_pred]), return_inverse=True)
+    k, n = len(labels), len(y_true)
+    cm = np.bincount(k * idx[:n] + idx[n:], minlength=k * k).reshape(k, k)
+    tp = np.diag(cm)
+    support = cm.sum(axis=1)
+    denom = 2 * tp + (cm.sum(axis=0) - tp) + (support - tp)  # 2tp + fp + fn
+    f1 = np.divide(2 * tp, denom, out=np.zeros(k), where=denom > 0)
+    return float(tp.sum() / n), float((f1 * support).sum() / support.sum())
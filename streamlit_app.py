@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import os, json, subprocess, pandas as pd, requests
+import os, io, json, contextlib, threading, traceback, pandas as pd, requests
 from pathlib import Path
 import streamlit as st
 import streamlit.components.v1 as components
@@ -25,31 +25,60 @@ st.caption(f"Serving via MLflow at `{SERVE_HOST}:{SERVE_PORT}`")
 @st.cache_data
 def load_data():
     if DATA_CSV.exists():
-        return pd.read_csv(DATA_CSV)
+        # the EDA tab only plots type and quality counts; skip parsing the 11 feature columns
+        return pd.read_csv(DATA_CSV, engine="pyarrow", usecols=["type", "quality"],
+                           dtype={"type": "category", "quality": "int8"})
     return None
 
+@st.cache_resource
+def http_session():
+    # one keep-alive session per server process instead of a new connection per ping
+    return requests.Session()
+
 def ping_mlflow():
     try:
-        r = requests.get(f"{MLFLOW_URL}/ping", timeout=3)
+        r = http_session().get(f"{MLFLOW_URL}/ping", timeout=3)
         return r.status_code, r.text
     except Exception as e:
         return None, str(e)
 
-def run_cmd(cmd: str):
-    """Run a shell command and return (ok, stdout+stderr)."""
-    try:
-        out = subprocess.check_output(cmd, shell=True, stderr=subprocess.STDOUT, text=True)
-        return True, out
-    except subprocess.CalledProcessError as e:
-        return False, e.output
-
-def read_json_safe(p: Path, default=None):
-    if p.exists():
+@st.cache_resource
+def step_lock():
+    # one per server process: the script itself re-runs on every interaction
+    return threading.Lock()
+
+def run_step(fn, **kwargs):
+    """Run a pipeline step in-process (no interpreter/import startup) and return (ok, captured output)."""
+    buf = io.StringIO()
+    # redirect_stdout swaps the process-wide sys.stdout, and sessions run on their own threads;
+    # one step at a time keeps outputs apart (the steps also share the artifacts/ files)
+    with step_lock():
         try:
-            return json.loads(p.read_text(encoding="utf-8"))
+            with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
+                fn(**kwargs)
+            return True, buf.getvalue()
         except Exception:
-            return default
-    return default
+            return False, buf.getvalue() + traceback.format_exc()
+
+@st.cache_data(max_entries=32)
+def _load_json(path: str, mtime_ns: int):
+    # mtime is part of the cache key, so a rewritten artifact is re-read on the next rerun
+    return json.loads(Path(path).read_bytes())
+
+def read_json_safe(p: Path, default=None):
+    try:
+        return _load_json(str(p), p.stat().st_mtime_ns)
+    except Exception:
+        return default
+
+@st.cache_resource(max_entries=2)
+def _load_html(path: str, mtime_ns: int):
+    # Evidently reports are multi-MB; re-read only when the file is regenerated. cache_resource
+    # hands back the same immutable str on every hit, where cache_data would unpickle a copy.
+    return Path(path).read_text(encoding="utf-8")
+
+def read_html(p: Path):
+    return _load_html(str(p), p.stat().st_mtime_ns)
 
 def show_metrics(metrics: dict, title="Metrics"):
     if not metrics:
@@ -104,10 +133,13 @@ with tab1:
     b1, b2 = st.columns([1,3])
     with b1:
         if st.button("Run Baseline Now"):
+            # imported on demand: evidently/sklearn load once per process, not on every rerun
+            from src.batch_infer import run as run_batch
+            from monitoring.monitor import main as run_monitor
             with st.spinner("Running batch inference..."):
-                ok1, log1 = run_cmd("python src/batch_infer.py --input artifacts/test.csv")
+                ok1, log1 = run_step(run_batch, input="artifacts/test.csv")
             with st.spinner("Generating baseline report..."):
-                ok2, log2 = run_cmd("python monitoring/monitor.py")
+                ok2, log2 = run_step(run_monitor)
             if ok1 and ok2:
                 st.success("Baseline ready: metrics.json + baseline.html")
             else:
@@ -119,7 +151,7 @@ with tab1:
         show_metrics(metrics, "Baseline Metrics (artifacts/metrics.json)")
         st.markdown("**Baseline Report (Evidently)**")
         if BASELINE_HTML.exists():
-            components.html(BASELINE_HTML.read_text(encoding="utf-8"), height=520, scrolling=True)
+            components.html(read_html(BASELINE_HTML), height=520, scrolling=True)
         else:
             st.info("Run baseline to generate artifacts/baseline.html")
 
@@ -128,8 +160,9 @@ with tab1:
     d1, d2 = st.columns([1,3])
     with d1:
         if st.button("Run Drift Test Now"):
+            from monitoring.perturb_test import main as run_perturb
             with st.spinner("Running drift perturbation & monitoring..."):
-                ok3, log3 = run_cmd("python monitoring/perturb_test.py")
+                ok3, log3 = run_step(run_perturb)
             if ok3:
                 st.success("Drift test ready: perturb_test_results.json + drift_after.html")
             else:
@@ -169,7 +202,7 @@ with tab1:
 
         st.markdown("**Drift Report (Evidently)**")
         if DRIFT_HTML.exists():
-            components.html(DRIFT_HTML.read_text(encoding="utf-8"), height=520, scrolling=True)
+            components.html(read_html(DRIFT_HTML), height=520, scrolling=True)
         else:
             st.info("Run drift test to generate artifacts/drift_after.html")
 